@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from functools import wraps
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from starlette.middleware.base import BaseHTTPMiddleware
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class RedisCache:
+    """Thin wrapper around the async Redis client.
+
+    Redis being down is treated as a cache miss so the API keeps serving
+    straight from the database.
+    """
+
+    def __init__(self, url):
+        self.redis = aioredis.from_url(url)
+
+    async def get(self, key):
+        try:
+            return await self.redis.get(key)
+        except RedisError as e:
+            print(f"Error reading {key} from the cache: {e}")
+            return None
+
+    async def set(self, key, value, expire):
+        try:
+            await self.redis.set(key, value, ex=expire)
+        except RedisError as e:
+            print(f"Error writing {key} to the cache: {e}")
+
+    async def delete_pattern(self, pattern):
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=pattern)]
+            if keys:
+                await self.redis.delete(*keys)
+        except RedisError as e:
+            print(f"Error invalidating {pattern} in the cache: {e}")
+
+
+cache = RedisCache(REDIS_URL)
+
+
+def cached(prefix, model, expire=300):
+    """Cache a route's JSON body in Redis, keyed by its query parameters.
+
+    `model` is the route's response model; it is used to serialize the
+    result once, and cache hits are returned as-is without touching the
+    database or re-serializing.
+    """
+    adapter = TypeAdapter(model)
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(**kwargs):
+            params = {name: value for name, value in kwargs.items() if name != "db"}
+            key = f"{prefix}:{func.__name__}:{json.dumps(params, sort_keys=True)}"
+
+            body = await cache.get(key)
+            if body is None:
+                result = await func(**kwargs)
+                body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+                await cache.set(key, body, expire)
+
+            return Response(content=body, media_type="application/json")
+
+        return wrapper
+
+    return decorator
+
+
+class ETagMiddleware(BaseHTTPMiddleware):
+    """Add ETag/Cache-Control to GET responses under `cached_endpoints`.
+
+    The ETag is a hash of the body; a request whose If-None-Match already
+    holds it gets an empty 304 instead of the full JSON.
+    """
+
+    def __init__(self, app, cached_endpoints, max_age=60, stale_while_revalidate=300):
+        super().__init__(app)
+        self.cached_endpoints = tuple(cached_endpoints)
+        self.cache_control = f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        if (
+            request.method != "GET"
+            or response.status_code != 200
+            or not request.url.path.startswith(self.cached_endpoints)
+        ):
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = f'W/"{hashlib.sha256(body).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        return Response(
+            content=body,
+            status_code=response.status_code,
+            headers={**response.headers, **headers},
+            media_type=response.media_type,
+        )
@@ -1,25 +1,51 @@
 from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File
-from pydantic import BaseModel, EmailStr, field_validator, ValidationInfo, validator
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, EmailStr, field_validator, ValidationInfo, validator, AfterValidator, Field
+from sqlalchemy import select, delete, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, lazyload
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import List, Optional, Annotated
+from decimal import Decimal
+from contextlib import asynccontextmanager
 from models import User, Cart, CartItem, Product, Order, OrderItem
 from database import SessionLocal, init_db
+from cache import cache, cached, ETagMiddleware
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from fastapi.staticfiles import StaticFiles
 
 from google.oauth2 import id_token
 from google.auth.transport import requests
 
+from passlib.context import CryptContext
+
 import shutil   # file operations for handling file copying, moving, removing, and directory management tasks. 
 import os
+import secrets
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize the database
+    await init_db()
+    yield
 
-app = FastAPI()
+# Render responses with orjson instead of the stdlib json module
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 GOOGLE_CLIENT_ID = "729091295543-ntjssfpmlq0c09oiav7sdl9cm1gdl34g.apps.googleusercontent.com"
 
+# One transport (and underlying requests.Session) for all logins, so the
+# keep-alive connection used to fetch Google's certificates is reused
+google_request = requests.Request()
+
+# Passwords are stored as salted argon2 hashes
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -29,26 +55,52 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
-# Initialize the database
-init_db()
+# Let clients revalidate product listings with If-None-Match instead of re-downloading them
+app.add_middleware(
+    ETagMiddleware,
+    cached_endpoints=["/products", "/products/byCategory/", "/products/byName/", "/products/byId/"],
+)
+
+# Compress JSON bodies for clients that accept gzip. Added last so it wraps the
+# ETag middleware and the ETag is computed on the uncompressed body.
+app.add_middleware(GZipMiddleware, minimum_size=512)
 
 # Dependency to get the database session
-def get_db():
+async def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+# Check a password against the stored hash (CPU-bound, so callers run it in the threadpool).
+# Returns (valid, new_hash); new_hash is set when the stored value should be replaced.
+# Accounts created before passwords were hashed still hold plaintext; those are compared
+# in constant time and get a hash on success, as do hashes with outdated settings.
+def verify_password(password: str, stored: Optional[str]):
+    if not stored:
+        return False, None  # e.g. Google accounts
+
+    if pwd_context.identify(stored) is None:
+        if not secrets.compare_digest(stored.encode(), password.encode()):
+            return False, None
+        return True, pwd_context.hash(password)
+
+    return pwd_context.verify_and_update(password, stored)
 
 # Route to display a welcome message
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the shopOnline API!"}
 
 # -------------------------------------------  USER  -------------------------------------------
+# Emails are lowercased on the way in, so they are stored that way and the
+# plain equality lookups on the indexed user.email column are case-insensitive
+LowerEmailStr = Annotated[EmailStr, AfterValidator(str.lower)]
+
 # Pydantic model for signup requests
 class UserSignup(BaseModel):
-    email: EmailStr
+    email: LowerEmailStr
     password: str
     confirm_password: str
 
@@ -61,17 +113,17 @@ class UserSignup(BaseModel):
 
 # Pydantic model for login requests
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: LowerEmailStr
     password: str
 
 # Pydantic model for user deletion requests
 class UserDelete(BaseModel):
-    email: EmailStr
+    email: LowerEmailStr
     password: str
 
 # Pydantic model for updating user password
 class UserPasswordUpdate(BaseModel):
-    email: EmailStr
+    email: LowerEmailStr
     current_password: str
     new_password: str
     confirm_new_password: str
@@ -95,33 +147,29 @@ class GoogleLogin(BaseModel):
     token: str
 
 @app.post("/google-login/")
-def google_login(google_login: GoogleLogin, db: Session = Depends(get_db)):
+async def google_login(google_login: GoogleLogin, db: AsyncSession = Depends(get_db)):
     try:
-        # Verify the Google JWT token
-        idinfo = id_token.verify_oauth2_token(google_login.token, requests.Request(), GOOGLE_CLIENT_ID)
+        # Verify the Google JWT token (blocking HTTP call, so keep it off the event loop)
+        idinfo = await run_in_threadpool(
+            id_token.verify_oauth2_token, google_login.token, google_request, GOOGLE_CLIENT_ID
+        )
 
         # Check if the user exists in the database
-        user_email = idinfo['email']
-        db_user = db.query(User).filter(User.email == user_email).first()
+        user_email = idinfo['email'].lower()
+        db_user = await db.scalar(
+            select(User).options(joinedload(User.cart).lazyload(Cart.items)).where(User.email == user_email)
+        )
 
         if not db_user:
-            # If the user does not exist, create a new user
-            db_user = User(email=user_email)
+            # If the user does not exist, create a new user with an associated cart
+            db_user = User(email=user_email, cart=Cart())
             db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
-
-            # Create an associated cart for the new user
-            new_cart = Cart(user=db_user)
-            db.add(new_cart)
-            db.commit()
+            await db.commit()
 
         # Ensure the user has a cart (for existing users)
-        if not db_user.cart:
-            new_cart = Cart(user=db_user)
-            db.add(new_cart)
-            db.commit()
-            db.refresh(new_cart)
+        elif not db_user.cart:
+            db_user.cart = Cart()
+            await db.commit()
 
         return {"message": "Login successful", "user_id": db_user.id, "email": db_user.email}
     
@@ -131,95 +179,95 @@ def google_login(google_login: GoogleLogin, db: Session = Depends(get_db)):
 
 # Route to sign up a new user
 @app.post("/signup/", response_model=UserResponse)
-def sign_up(user: UserSignup, db: Session = Depends(get_db)):
+async def sign_up(user: UserSignup, db: AsyncSession = Depends(get_db)):
     # Check if the email is already registered
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    email_taken = await db.scalar(select(User.id).where(User.email == user.email).limit(1))
+    if email_taken:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create a new user
-    new_user = User(email=user.email, password=user.password)
+    # Create a new user along with their cart
+    password_hash = await run_in_threadpool(pwd_context.hash, user.password)
+    new_user = User(email=user.email, password=password_hash, cart=Cart())
     db.add(new_user)
 
     try:
-        db.commit()
-        db.refresh(new_user)  # Refresh to get the new user's ID
+        await db.commit()
+        await db.refresh(new_user)  # Refresh to get the new user's ID
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Could not create user due to integrity error")
 
-    # Create a cart for the new user
-    if not new_user.cart:
-        new_cart = Cart(user=new_user)
-        db.add(new_cart)
-        db.commit()
-        db.refresh(new_cart)
-
     # Return the response with the correct field names
     return {"id": new_user.id, "email": new_user.email}
 
 # Route to login a user
 @app.post("/login/")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    # Check if the user exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user is None:
+async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    # Check if the user exists (only the columns needed to log in, plus
+    # whether they have a cart)
+    row = (await db.execute(
+        select(User.id, User.email, User.password, Cart.id.label("cart_id"))
+        .outerjoin(User.cart)
+        .where(User.email == user.email)
+    )).one_or_none()
+    if row is None:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     # Check if the password is correct
-    if db_user.password != user.password:
+    valid, new_hash = await run_in_threadpool(verify_password, user.password, row.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    # Ensure the user has a cart
-    if not db_user.cart:
-        new_cart = Cart(user=db_user)
-        db.add(new_cart)
-        db.commit()
-        db.refresh(new_cart)  # Refresh to get the new cart ID
+    # Write only when there is something to save: an upgraded password hash
+    # and/or a missing cart
+    if new_hash or row.cart_id is None:
+        if new_hash:
+            await db.execute(update(User).where(User.id == row.id).values(password=new_hash))
+        if row.cart_id is None:
+            db.add(Cart(user_id=row.id))
+        await db.commit()
 
-    return {"message": "Login successful", "user_id": db_user.id, "email": db_user.email}
+    return {"message": "Login successful", "user_id": row.id, "email": row.email}
 
 # Route to delete a user by email and password
 @app.delete("/removeUser/")
-def delete_user(user: UserDelete, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email, User.password == user.password).first()
+async def delete_user(user: UserDelete, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user is None:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    # Access and delete user's cart through the User relationship
-    if db_user.cart:
-        db.delete(db_user.cart)
-        
-    # Also delete the user's orders and associated order items if necessary
-    user_orders = db.query(Order).filter(Order.user_id == db_user.id).all()
-    for order in user_orders:
-        # Delete associated order items
-        db.query(OrderItem).filter(OrderItem.order_id == order.id).delete()
-        db.delete(order)
-    
-    # Finally, delete the user
-    db.delete(db_user)
+    valid, _ = await run_in_threadpool(verify_password, user.password, db_user.password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # Delete the user; their cart, orders and all their items go with
+    # ON DELETE CASCADE in the database
+    await db.delete(db_user)
 
     try:
-        db.commit()
+        await db.commit()
         return {"message": "User and associated data successfully deleted"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred while deleting the user: {str(e)}")
     
 # Route to update the user's password
 @app.put("/updatePassword/")
-def update_password(data: UserPasswordUpdate, db: Session = Depends(get_db)):
-    # Fetch the user by email and current password
-    db_user = db.query(User).filter(User.email == data.email, User.password == data.current_password).first()
+async def update_password(data: UserPasswordUpdate, db: AsyncSession = Depends(get_db)):
+    # Fetch the user by email and check the current password
+    db_user = await db.scalar(select(User).where(User.email == data.email))
     
     if db_user is None:
         raise HTTPException(status_code=401, detail="Invalid email or current password")
+
+    valid, _ = await run_in_threadpool(verify_password, data.current_password, db_user.password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or current password")
     
     # Update the user's password
-    db_user.password = data.new_password
-    db.commit()
-    db.refresh(db_user)
+    db_user.password = await run_in_threadpool(pwd_context.hash, data.new_password)
+    await db.commit()
+    await db.refresh(db_user)
 
     return {"message": "Password updated successfully"}
 
@@ -231,7 +279,9 @@ def update_password(data: UserPasswordUpdate, db: Session = Depends(get_db)):
 class ProductCreate(BaseModel):
     name: str
     category: str  # Replace description with category
-    price: float
+    # Decimal so the price reaches the Numeric(10, 2) column exactly; anything
+    # that doesn't fit it is a 422 rather than rounded or a database error
+    price: Decimal = Field(max_digits=10, decimal_places=2)
 
 # Pydantic model for product response
 class ProductResponse(BaseModel):
@@ -244,29 +294,40 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
+UPLOAD_DIR = 'static/images/products'
+# Created once here instead of with a blocking call inside every upload request
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+ALLOWED_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+
+# Blocking file copy; create_product runs it in the threadpool
+def save_upload(source, path):
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
 # Create a new product and save its image
 @app.post("/addProduct", response_model=ProductResponse)
 async def create_product(
     name: str,
     category: str,
-    price: float,
+    price: Annotated[Decimal, Query(max_digits=10, decimal_places=2)],
     image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    upload_dir = 'static/images/products'
-    os.makedirs(upload_dir, exist_ok=True)
-
-    if not image.filename.endswith(('.png', '.jpg', '.jpeg')):
+    if os.path.splitext(image.filename)[1].lower() not in ALLOWED_IMAGE_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Invalid image format. Please upload a PNG or JPEG image.")
 
-    image_path = os.path.join(upload_dir, image.filename)
-    with open(image_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    image_path = os.path.join(UPLOAD_DIR, image.filename)
+    # Write the image off the event loop so large uploads don't stall other requests
+    await run_in_threadpool(save_upload, image.file, image_path)
 
     new_product = Product(name=name, category=category, image=image_path, price=price)
     db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
+    await db.commit()
+    await db.refresh(new_product)
+
+    # Drop cached product listings so they pick up the new product
+    await cache.delete_pattern("products:*")
 
     return new_product
 
@@ -274,25 +335,31 @@ async def create_product(
 # __________________________________________
 # READ products:
 
-# Serve static files from the "frontend/src/assets" directory
-app.mount("/static", StaticFiles(directory= "frontend/src/assets"), name="static")
+# Serve static files from the "frontend/src/assets" directory.
+# In production nginx serves /static straight from disk (see nginx.conf),
+# so the Python workers never handle image requests.
+if os.getenv("ENV") != "prod":
+    app.mount("/static", StaticFiles(directory= "frontend/src/assets"), name="static")
 
 @app.get("/products/", response_model=List[ProductResponse])
-def read_products(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
+@cached(prefix="products", model=List[ProductResponse])
+async def read_products(db: AsyncSession = Depends(get_db)):
+    products = (await db.scalars(select(Product))).all()
     return products
 
 @app.get("/products", response_model=List[ProductResponse])
-def read_products(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
+@cached(prefix="products", model=List[ProductResponse])
+async def read_products(db: AsyncSession = Depends(get_db)):
+    products = (await db.scalars(select(Product))).all()
     return products
 
 @app.get("/products/byName/", response_model=List[ProductResponse])
-def read_products_by_name(name: Optional[str] = None, db: Session = Depends(get_db)):
+@cached(prefix="products", model=List[ProductResponse])
+async def read_products_by_name(name: Optional[str] = None, db: AsyncSession = Depends(get_db)):
     if name is None:
         raise HTTPException(status_code=400, detail="Query parameter 'name' is required")
     
-    products = db.query(Product).filter(Product.name.ilike(f"%{name}%")).all()
+    products = (await db.scalars(select(Product).where(Product.name.ilike(f"%{name}%")))).all()
     
     if not products:
         raise HTTPException(status_code=404, detail="No products found with the given name.")
@@ -300,17 +367,18 @@ def read_products_by_name(name: Optional[str] = None, db: Session = Depends(get_
     return products
 
 @app.get("/products/byId/{product_id}", response_model=ProductResponse)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+async def read_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    product = await db.get(Product, product_id)
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 @app.get("/products/byCategory/", response_model=List[ProductResponse])
-def read_products_by_category(category: Optional[str] = None, db: Session = Depends(get_db)):
+@cached(prefix="products", model=List[ProductResponse])
+async def read_products_by_category(category: Optional[str] = None, db: AsyncSession = Depends(get_db)):
     if category is None:
         raise HTTPException(status_code=400, detail="Query parameter 'category' is required")
-    products = db.query(Product).filter(Product.category.ilike(f"%{category}%")).all()
+    products = (await db.scalars(select(Product).where(Product.category.ilike(f"%{category}%")))).all()
     if not products:
         raise HTTPException(status_code=404, detail="No products found for the specified category")
     return products
@@ -318,8 +386,8 @@ def read_products_by_category(category: Optional[str] = None, db: Session = Depe
 # __________________________________________
 # UPDATE a product:
 @app.put("/products/updateProduct/{product_id}", response_model=ProductResponse)
-def update_product(product_id: int, product: ProductCreate, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+async def update_product(product_id: int, product: ProductCreate, db: AsyncSession = Depends(get_db)):
+    db_product = await db.get(Product, product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -327,20 +395,24 @@ def update_product(product_id: int, product: ProductCreate, db: Session = Depend
     db_product.category = product.category  # Update category instead of description
     db_product.price = product.price
 
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+
+    await cache.delete_pattern("products:*")
     return db_product
 
 # __________________________________________
 # DELETE a product:
 @app.delete("/products/remove/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    db_product = await db.get(Product, product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    
-    db.delete(db_product)
-    db.commit()
+
+    await db.delete(db_product)
+    await db.commit()
+
+    await cache.delete_pattern("products:*")
     return {"detail": "Product deleted successfully"}
 
 # # ----------------------------------------------------------------------------------------------------------
@@ -388,10 +460,80 @@ class CartResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Single-statement "insert the item, or add to its quantity if the product is
+# already in the cart"; relies on the unique (cart_id, product_id) index.
+# The product's name, image and price are copied onto the item so reading the
+# cart never needs the product table; adding it again refreshes the name and
+# image and adds the new units at the current price, without repricing the
+# units already in the cart (the handlers add the same amount to the cart total).
+def cart_item_upsert(cart_id: int, product: Product, quantity: int):
+    stmt = pg_insert(CartItem).values(
+        cart_id=cart_id,
+        product_id=product.id,
+        product_name=product.name,
+        product_image=product.image,
+        quantity=quantity,
+        price=product.price,
+        total_price=quantity * product.price,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={
+            "product_name": stmt.excluded.product_name,
+            "product_image": stmt.excluded.product_image,
+            "quantity": CartItem.quantity + stmt.excluded.quantity,
+            "total_price": CartItem.total_price + stmt.excluded.total_price,
+        },
+    )
+
+# Load a user's cart and its items in a single SELECT, found through the
+# unique cart.user_id index without touching the user table
+async def get_user_cart(db: AsyncSession, user_id: int):
+    result = await db.scalars(
+        select(Cart).options(joinedload(Cart.items)).where(Cart.user_id == user_id)
+    )
+    return result.unique().one_or_none()
+
+# Find one of the user's cart items in the loaded graph. A missing item is
+# reported before a missing cart, so the item is only looked up on its own
+# when the user or their cart doesn't exist.
+async def get_cart_and_item(db: AsyncSession, user_id: int, item_id: int):
+    cart = await get_user_cart(db, user_id)
+    if cart is None:
+        if await db.scalar(select(CartItem.id).where(CartItem.id == item_id)) is None:
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        raise HTTPException(status_code=404, detail="Cart not found")
+
+    cart_item = next((item for item in cart.items if item.id == item_id), None)
+    if cart_item is None:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+
+    return cart, cart_item
+
+# Build a cart response from the items already loaded on the cart, so the
+# mutating handlers don't have to fetch the cart again after committing
+def cart_response(cart: Cart):
+    return CartResponse(
+        id=cart.id,
+        total_price=cart.total_price,
+        items=[
+            CartItemResponse(
+                id=item.id,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price=item.price,
+                total_price=item.total_price,
+                product_name=item.product_name,
+                product_image=item.product_image,
+            )
+            for item in cart.items
+        ],
+    )
+
 # __________________________________________
 # Add product to cart
 @app.post("/cart/add", response_model=CartResponse)
-def add_to_cart(item: CartItemCreate, db: Session = Depends(get_db)):
+async def add_to_cart(item: CartItemCreate, db: AsyncSession = Depends(get_db)):
     # Log incoming request data for debugging
     print(f"Received item: {item}")
 
@@ -401,114 +543,85 @@ def add_to_cart(item: CartItemCreate, db: Session = Depends(get_db)):
 
     user_id = item.user_id
     # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
+    # (every user gets a cart at signup/login, so no cart means no user)
+    cart = await db.scalar(select(Cart).options(lazyload(Cart.items)).where(Cart.user_id == user_id))
+    if cart is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Retrieve the product
-    product = db.query(Product).filter(Product.id == item.product_id).first()
+    # Retrieve the product; get() checks the session's identity map (our
+    # per-request cache) before querying
+    product = await db.get(Product, item.product_id)
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Check if item already in cart
-    cart_item = db.query(CartItem).filter(
-        CartItem.cart_id == db_user.cart.id, CartItem.product_id == item.product_id
-    ).first()
-    if cart_item:
-        cart_item.quantity += item.quantity
-        cart_item.total_price = cart_item.quantity * product.price
-    else:
-        # Create a new cart item
-        cart_item = CartItem(
-            cart_id=db_user.cart.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=product.price,
-            total_price=item.quantity * product.price,
-        )
-        db.add(cart_item)
+    # Add the item to the cart, or bump its quantity if it's already there
+    await db.execute(cart_item_upsert(cart.id, product, item.quantity))
 
-    # Update cart total price
-    db_user.cart.total_price += item.quantity * product.price
+    # Update cart total price in SQL; the upsert bypasses the CartItem events
+    cart.total_price = Cart.total_price + item.quantity * product.price
 
     # Commit the transaction
-    db.commit()
+    await db.commit()
 
     # Refresh the cart
-    db.refresh(db_user.cart)
+    await db.refresh(cart, ["total_price", "items"])
 
     # Log the updated cart for debugging
-    print(f"Updated cart: {db_user.cart}")
+    print(f"Updated cart: {cart}")
 
-    return db_user.cart
+    return cart
 
 @app.post("/cart/update", response_model=CartResponse)
-def update_cart(item: CartItemUpdate, db: Session = Depends(get_db)):
+async def update_cart(item: CartItemCreate, db: AsyncSession = Depends(get_db)):
     # Validate quantity
     if item.quantity == 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than zero")
 
     user_id = item.user_id
     # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
+    # (every user gets a cart at signup/login, so no cart means no user)
+    cart = await db.scalar(select(Cart).options(lazyload(Cart.items)).where(Cart.user_id == user_id))
+    if cart is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Retrieve the product
-    product = db.query(Product).filter(Product.id == item.product_id).first()
+    # Retrieve the product; get() checks the session's identity map (our
+    # per-request cache) before querying
+    product = await db.get(Product, item.product_id)
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Retrieve or create the cart item
-    cart_item = db.query(CartItem).filter(
-        CartItem.cart_id == db_user.cart.id, CartItem.product_id == item.product_id
-    ).first()
-
-    if cart_item:
-        if item.quantity > 0:
-            cart_item.quantity += item.quantity
-            cart_item.total_price = cart_item.quantity * product.price
-        else:
-            db.delete(cart_item)
+    # Add to (or create) the cart item, or remove it for a negative quantity.
+    # Update cart total price in SQL; these statements bypass the CartItem events
+    if item.quantity > 0:
+        await db.execute(cart_item_upsert(cart.id, product, item.quantity))
+        cart.total_price = Cart.total_price + item.quantity * product.price
     else:
-        if item.quantity > 0:
-            cart_item = CartItem(
-                cart_id=db_user.cart.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price=product.price,
-                total_price=item.quantity * product.price,
-            )
-            db.add(cart_item)
-
-    # Update cart total price
-    db_user.cart.total_price += item.quantity * product.price
+        removed_total = await db.scalar(
+            delete(CartItem)
+            .where(CartItem.cart_id == cart.id, CartItem.product_id == item.product_id)
+            .returning(CartItem.total_price)
+        )
+        if removed_total is not None:
+            cart.total_price = Cart.total_price - removed_total
 
     # Commit the transaction
-    db.commit()
-    db.refresh(db_user.cart)
+    await db.commit()
+    await db.refresh(cart, ["total_price", "items"])
 
-    return db_user.cart
+    return cart
 
 
 #  __________________________________________
 # READ: View cart items
 @app.get("/cart/")
-def get_cart(user_id: int, db: Session = Depends(get_db)):
-    # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None or db_user.cart is None:
+async def get_cart(user_id: int, db: AsyncSession = Depends(get_db)):
+    # Retrieve the user's cart along with its items
+    cart = await get_user_cart(db, user_id)
+    if cart is None:
         raise HTTPException(status_code=404, detail="Cart not found")
 
     # Return cart details
-    cart = db_user.cart
-    items = (
-        db.query(CartItem)
-        .join(Product, CartItem.product_id == Product.id)
-        .filter(CartItem.cart_id == cart.id)
-        .order_by(CartItem.id)  # Ensure items are ordered by their ID
-        .all()
-    )
+    items = cart.items
     total_price = sum(item.total_price for item in items)
 
     return {
@@ -521,8 +634,8 @@ def get_cart(user_id: int, db: Session = Depends(get_db)):
                 "quantity": item.quantity,
                 "price": item.price,
                 "total_price": item.total_price,
-                "product_name": item.product.name,  # Add product name
-                "product_image": item.product.image,  # Add product image
+                "product_name": item.product_name,  # Add product name
+                "product_image": item.product_image,  # Add product image
             }
             for item in items
         ],
@@ -531,223 +644,94 @@ def get_cart(user_id: int, db: Session = Depends(get_db)):
 #  __________________________________________
 # UPDATE cart item (uodate quantity)
 @app.put("/cart/update/{item_id}", response_model=CartResponse)
-def update_cart_item(item_id: int, quantity_update: CartItemUpdate, user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Retrieve the cart item
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id).first()
-    if cart_item is None:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-
-    # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None or db_user.cart is None:
-        raise HTTPException(status_code=404, detail="Cart not found")
-
-    # Retrieve the product to get the price
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
+async def update_cart_item(item_id: int, quantity_update: CartItemUpdate, user_id: int = Query(...), db: AsyncSession = Depends(get_db)):
+    # Retrieve the user's cart and the cart item in one query
+    cart, cart_item = await get_cart_and_item(db, user_id, item_id)
 
     # Validate the quantity
     if quantity_update.quantity <= 0:
         raise HTTPException(status_code=400, detail="Invalid quantity")
 
-    # Update the cart item quantity and total price
+    # Update the cart item quantity and total price (the cart total follows
+    # through the CartItem events)
     cart_item.quantity = quantity_update.quantity
-    cart_item.total_price = quantity_update.quantity * product.price
-
-    # Update cart total price
-    cart = db_user.cart
-    cart.total_price = sum(item.total_price for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all())
+    cart_item.total_price = quantity_update.quantity * cart_item.price
 
     # Commit the transaction
-    db.commit()
-    db.refresh(cart)
+    await db.commit()
 
-    return CartResponse(
-        id=cart.id,
-        total_price=cart.total_price,
-        items=[CartItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.price,
-            total_price=item.total_price
-        ) for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all()]
-    )
+    return cart_response(cart)
 
 # reset cart to an empty cart:
 @app.put("/cart/reset/{user_id}")
-def reset_cart(user_id: int, db: Session = Depends(get_db)):
+async def reset_cart(user_id: int, db: AsyncSession = Depends(get_db)):
     # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None or db_user.cart is None:
+    cart = await db.scalar(select(Cart).options(lazyload(Cart.items)).where(Cart.user_id == user_id))
+    if cart is None:
         raise HTTPException(status_code=404, detail="Cart not found")
 
-    # Retrieve all cart items
-    cart_items = db.query(CartItem).filter(CartItem.cart_id == db_user.cart.id).all()
-
-    # Delete all cart items
-    for item in cart_items:
-        db.delete(item)
+    # Delete all cart items in one statement
+    await db.execute(
+        delete(CartItem).where(CartItem.cart_id == cart.id),
+        execution_options={"synchronize_session": False},
+    )
 
     # Reset cart total price to 0
-    db_user.cart.total_price = 0
+    cart.total_price = Decimal("0.00")
 
     # Commit the transaction
-    db.commit()
-    db.refresh(db_user.cart)
+    await db.commit()
 
-    return db_user.cart
+    return cart
 
 # DELETE item from cart
 @app.delete("/cart/remove", response_model=CartResponse)
-def remove_cart_item(item_id: int = Query(...), user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Retrieve the cart item
-    cart_item = db.query(CartItem).filter(CartItem.id == item_id).first()
-    if cart_item is None:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-
-    # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None or db_user.cart is None:
-        raise HTTPException(status_code=404, detail="Cart not found")
+async def remove_cart_item(item_id: int = Query(...), user_id: int = Query(...), db: AsyncSession = Depends(get_db)):
+    # Retrieve the user's cart and the cart item in one query
+    cart, cart_item = await get_cart_and_item(db, user_id, item_id)
 
-    # Update cart total price
-    cart = db_user.cart
-    cart.total_price -= cart_item.total_price
-
-    # Delete the cart item
-    db.delete(cart_item)
-    db.commit()
-    db.refresh(cart)
-
-    # Prepare the response data
-    cart_items_response = [
-        CartItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.price,
-            total_price=item.total_price,
-            product_name=item.product.name,  # Include product name
-            product_image=item.product.image,  # Include product image
-        )
-        for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all()
-    ]
+    # Delete the cart item (the cart total follows through the CartItem events)
+    cart.items.remove(cart_item)
+    await db.delete(cart_item)
+    await db.commit()
 
-    return CartResponse(
-        id=cart.id,
-        total_price=cart.total_price,
-        items=cart_items_response
-    )
+    return cart_response(cart)
 
 #  __________________________________________
 #  __________________________________________
 # INCREMENT an item
 @app.put("/cart/increment", response_model=CartResponse)
-def increment_cart_item(request: IncrementRequest, db: Session = Depends(get_db)):
-    # Retrieve the cart item
-    cart_item = db.query(CartItem).filter(CartItem.id == request.item_id).first()
-    if cart_item is None:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-
-    # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == request.user_id).first()
-    if db_user is None or db_user.cart is None:
-        raise HTTPException(status_code=404, detail="Cart not found")
+async def increment_cart_item(request: IncrementRequest, db: AsyncSession = Depends(get_db)):
+    # Retrieve the user's cart and the cart item in one query
+    cart, cart_item = await get_cart_and_item(db, request.user_id, request.item_id)
 
-    # Retrieve the product to get the price
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    # Increment the cart item quantity and update total price
+    # Increment the cart item quantity and update total price (the cart total
+    # follows through the CartItem events)
     cart_item.quantity += 1
-    cart_item.total_price = cart_item.quantity * product.price
-
-    # Update cart total price
-    cart = db_user.cart
-    cart.total_price = sum(
-        item.total_price for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all()
-    )
+    cart_item.total_price = cart_item.quantity * cart_item.price
 
     # Commit the transaction
-    db.commit()
-    db.refresh(cart)
+    await db.commit()
 
-    return CartResponse(
-        id=cart.id,
-        total_price=cart.total_price,
-        items=[
-            CartItemResponse(
-                id=item.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price=item.price,
-                total_price=item.total_price,
-                product_name=item.product.name,  # Include product name
-                product_image=item.product.image,  # Include product image
-            )
-            for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all()
-        ],
-    )
+    return cart_response(cart)
 
 #  __________________________________________
 # DECREMENT an item
 @app.put("/cart/decrement", response_model=CartResponse)
-def decrement_cart_item(request: DecrementRequest, db: Session = Depends(get_db)):
-    # Retrieve the cart item
-    cart_item = db.query(CartItem).filter(CartItem.id == request.item_id).first()
-    if cart_item is None:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-
-    # Retrieve the user's cart
-    db_user = db.query(User).filter(User.id == request.user_id).first()
-    if db_user is None or db_user.cart is None:
-        raise HTTPException(status_code=404, detail="Cart not found")
-
-    # Retrieve the product to get the price
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
+async def decrement_cart_item(request: DecrementRequest, db: AsyncSession = Depends(get_db)):
+    # Retrieve the user's cart and the cart item in one query
+    cart, cart_item = await get_cart_and_item(db, request.user_id, request.item_id)
 
-    # Decrement the cart item quantity if greater than 1
+    # Decrement the cart item quantity if greater than 1 (the cart total
+    # follows through the CartItem events)
     if cart_item.quantity > 1:
         cart_item.quantity -= 1
-        cart_item.total_price = cart_item.quantity * product.price
-
-        # Update cart total price
-        cart = db_user.cart
-        cart.total_price = sum(
-            item.total_price for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all()
-        )
+        cart_item.total_price = cart_item.quantity * cart_item.price
 
         # Commit the transaction
-        db.commit()
-        db.refresh(cart)
-    else:
-        # If the quantity is 1, do nothing
-        cart = db_user.cart
-
-    # Prepare the response data
-    cart_items_response = [
-        CartItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.price,
-            total_price=item.total_price,
-            product_name=item.product.name,  # Include product name
-            product_image=item.product.image,  # Include product image
-        )
-        for item in db.query(CartItem).filter(CartItem.cart_id == cart.id).all()
-    ]
+        await db.commit()
 
-    return CartResponse(
-        id=cart.id,
-        total_price=cart.total_price,
-        items=cart_items_response,
-    )
+    return cart_response(cart)
 
 # # ------------------------------------------------------------------------------------------------------------
 # # -------------------------------------------  ORDER & ORDER-ITEM  -------------------------------------------
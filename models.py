@@ -1,24 +1,47 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Table, Index, DDL, event, inspect, update
+from sqlalchemy.orm import relationship, object_session, Session
+from sqlalchemy.orm.attributes import set_committed_value
 from database import Base
 
+# Money is stored exactly, to the cent; values come back as Decimal.
+# create_all doesn't change existing columns: databases created while prices
+# were Float need them converted by hand, e.g.
+#   ALTER TABLE product ALTER COLUMN price TYPE numeric(10, 2);
+# and likewise for cart.total_price and cart_item/order_item price and total_price.
+Money = Numeric(10, 2)
+
 class User(Base):
     __tablename__ = 'user'
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     password = Column(String)
-    cart_id = Column(Integer, ForeignKey('cart.id'))
-    cart = relationship("Cart", back_populates="user", uselist=False)
-    orders = relationship("Order", back_populates="user")
+    # Loaded explicitly with joinedload/selectinload where needed; anything
+    # else would be an implicit lazy load, which asyncio sessions can't do.
+    # The cart (and its items) is removed with the user by ON DELETE CASCADE.
+    cart = relationship(
+        "Cart", back_populates="user", uselist=False, lazy="raise_on_sql",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+    # Orders (and their items) are removed by ON DELETE CASCADE in the
+    # database; passive_deletes stops the ORM loading them first
+    orders = relationship(
+        "Order", back_populates="user", lazy="raise_on_sql",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
 
 class Cart(Base):
     __tablename__ = 'cart'
 
     id = Column(Integer, primary_key=True, index=True)
-    total_price = Column(Float, default=0.0)
-    user = relationship("User", back_populates="cart", uselist=False)
-    items = relationship("CartItem", back_populates="cart")
+    # One cart per user; the unique index also serves the cart lookups by user
+    user_id = Column(Integer, ForeignKey('user.id', ondelete="CASCADE"), unique=True, index=True)
+    total_price = Column(Money, default=0)
+    user = relationship("User", back_populates="cart", lazy="raise_on_sql")
+    items = relationship(
+        "CartItem", back_populates="cart", order_by="CartItem.id", lazy="selectin",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
 
 class Product(Base):
     __tablename__ = 'product'
@@ -27,22 +50,47 @@ class Product(Base):
     name = Column(String, index=True)
     category = Column(String, index=True)  # New category field
     image = Column(String)  # Stores the path to the image file
-    price = Column(Float)
+    price = Column(Money)
 
     def __repr__(self):
         return f"<Product(name={self.name}, price={self.price})>"
 
+# Trigram GIN indexes so the ILIKE '%...%' searches on name/category can use an
+# index instead of scanning the whole table (Postgres only)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+Index(
+    "ix_product_name_trgm", Product.name,
+    postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_product_category_trgm", Product.category,
+    postgresql_using="gin", postgresql_ops={"category": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
 class CartItem(Base):
     __tablename__ = 'cart_item'
+    __table_args__ = (
+        # One row per product in a cart; also serves the cart_id/product_id lookups
+        # and, as the leading column, lookups by cart_id alone
+        Index("ix_cart_item_cart_product", "cart_id", "product_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    cart_id = Column(Integer, ForeignKey('cart.id'))
-    product_id = Column(Integer, ForeignKey('product.id'))
+    cart_id = Column(Integer, ForeignKey('cart.id', ondelete="CASCADE"))
+    product_id = Column(Integer, ForeignKey('product.id'), index=True)
+    # Copied from the product when the item is added, so listing a cart
+    # doesn't need to join product
+    product_name = Column(String)
+    product_image = Column(String)
     quantity = Column(Integer, default=1)
-    price = Column(Float)
-    total_price = Column(Float)
-    cart = relationship("Cart", back_populates="items")
-    product = relationship("Product")
+    price = Column(Money)
+    total_price = Column(Money)
+    cart = relationship("Cart", back_populates="items", lazy="raise_on_sql")
+    product = relationship("Product", lazy="raise_on_sql")
 
 # class Order(Base):
 #     __tablename__ = 'order'
@@ -69,19 +117,64 @@ class Order(Base):
     __tablename__ = 'order'
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('user.id'))
-    total_price = Column(Float, default=0.0)
-    user = relationship("User", back_populates="orders")
-    items = relationship("OrderItem", back_populates="order")
+    user_id = Column(Integer, ForeignKey('user.id', ondelete="CASCADE"), index=True)
+    total_price = Column(Money, default=0)
+    user = relationship("User", back_populates="orders", lazy="raise_on_sql")
+    items = relationship(
+        "OrderItem", back_populates="order", lazy="selectin",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
 
 class OrderItem(Base):
     __tablename__ = 'order_item'
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey('order.id'))
-    product_id = Column(Integer, ForeignKey('product.id'))
+    order_id = Column(Integer, ForeignKey('order.id', ondelete="CASCADE"), index=True)
+    product_id = Column(Integer, ForeignKey('product.id'), index=True)
+    # Copied from the cart item at checkout, like CartItem's
+    product_name = Column(String)
+    product_image = Column(String)
     quantity = Column(Integer, default=1)
-    price = Column(Float)
-    total_price = Column(Float)
-    order = relationship("Order", back_populates="items")
-    product = relationship("Product")
\ No newline at end of file
+    price = Column(Money)
+    total_price = Column(Money)
+    order = relationship("Order", back_populates="items", lazy="raise_on_sql")
+    product = relationship("Product", lazy="raise_on_sql")
+
+# Keep Cart/Order.total_price in step with their items: every flushed
+# insert/update/delete of an item adds its change to the parent in SQL
+# (total_price = total_price + delta) instead of re-summing the items, and the
+# new total is copied onto the parent if it's loaded in the session.
+def _add_to_total(connection, target, parent, parent_id, delta):
+    if parent_id is None or not delta:
+        return
+
+    new_total = connection.execute(
+        update(parent)
+        .where(parent.id == parent_id)
+        .values(total_price=parent.total_price + delta)
+        .returning(parent.total_price)
+    ).scalar_one_or_none()
+
+    session = object_session(target)
+    loaded = session.identity_map.get(Session.identity_key(parent, parent_id)) if session else None
+    if loaded is not None and new_total is not None:
+        set_committed_value(loaded, "total_price", new_total)
+
+def track_total(item, parent, parent_id):
+    @event.listens_for(item, "after_insert")
+    def item_inserted(mapper, connection, target):
+        _add_to_total(connection, target, parent, getattr(target, parent_id), target.total_price or 0)
+
+    @event.listens_for(item, "after_update")
+    def item_updated(mapper, connection, target):
+        history = inspect(target).attrs.total_price.history
+        if history.deleted:
+            delta = (target.total_price or 0) - (history.deleted[0] or 0)
+            _add_to_total(connection, target, parent, getattr(target, parent_id), delta)
+
+    @event.listens_for(item, "after_delete")
+    def item_deleted(mapper, connection, target):
+        _add_to_total(connection, target, parent, getattr(target, parent_id), -(target.total_price or 0))
+
+track_total(CartItem, Cart, "cart_id")
+track_total(OrderItem, Order, "order_id")
@@ -1,48 +1,238 @@
 # test_main.py
 
+import os
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event, select, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.exc import IntegrityError
-from main import app
-from database import Base, init_db, DATABASE_URL
+from redis import asyncio as aioredis
+from main import app, get_db, pwd_context
+from cache import cache
+from database import Base
 
 from models import User, Product, Cart, CartItem, Order, OrderItem
 
-#  Create a new engine and sessionmaker for the test database
-engine = create_engine(DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Every test (and async fixture) runs on anyio's pytest plugin
+pytestmark = pytest.mark.anyio
+
+# Tests run against an in-memory SQLite database rather than the app's
+# Postgres one. StaticPool keeps a single connection, so every session sees
+# the same database; being in memory it is also private to each process, so
+# pytest-xdist workers (`pytest -n auto test_main.py`) never share tables.
+TEST_DATABASE_URL = "sqlite+aiosqlite://"
+test_engine = create_async_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+# SQLite only enforces the ON DELETE CASCADEs with foreign_keys on, and only
+# supports SAVEPOINTs once the driver stops managing transactions itself
+@event.listens_for(test_engine.sync_engine, "connect")
+def sqlite_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+@event.listens_for(test_engine.sync_engine, "begin")
+def sqlite_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+#  Sessionmaker for the test database; the db fixture binds it to the
+# connection each test runs in
+TestingSessionLocal = async_sessionmaker(test_engine, autoflush=False, expire_on_commit=False)
 
 # Override the get_db dependency to use the test database
-def override_get_db():
+async def override_get_db():
+    db = TestingSessionLocal()
     try:
-        db = TestingSessionLocal()
         yield db
     finally:
-        db.close()
-
-# Apply the override to the app
-app.dependency_overrides[init_db] = override_get_db
-
-# Initialize the test client
-client = TestClient(app)
-
-# This function will run before each test function
-@pytest.fixture(autouse=True)
-def setup_and_teardown():
-    # Create the database tables
-    Base.metadata.create_all(bind=engine)
+        await db.close()
+
+# The product routes cache their responses in Redis; the tests use a Redis
+# database of their own, so products they roll back never reach the app's cache
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15")
+
+# While this module's tests run, point the app at the test database and the
+# test Redis database, and hash passwords with argon2's cheapest settings (the
+# suite hashes and verifies on every signup/login, and the production cost
+# only makes that slow here). All of it is put back afterwards, so other test
+# modules in the same run, such as the benchmarks, see the app as it really is.
+@pytest.fixture(scope="module", autouse=True)
+async def isolated_app_state(anyio_backend):
+    original_hashing = pwd_context.to_dict()
+    pwd_context.update(argon2__rounds=1, argon2__memory_cost=8, argon2__parallelism=1)
+    app.dependency_overrides[get_db] = override_get_db
+    app_redis = cache.redis
+    cache.redis = aioredis.from_url(TEST_REDIS_URL)
     yield
-    # Drop all tables after each test to keep tests isolated
-    Base.metadata.drop_all(bind=engine)
+    await cache.redis.aclose()
+    cache.redis = app_redis
+    app.dependency_overrides.pop(get_db, None)
+    pwd_context.load(original_hashing)
+
+# One asyncio event loop for the whole session, shared by the session-scoped
+# fixtures below and by every test
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+# Create the tables once for the whole run, the first time a test needs the
+# database
+@pytest.fixture(scope="session")
+async def setup_and_teardown(anyio_backend):
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    # Drop all tables after the last test
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await test_engine.dispose()
+
+# Run a test inside a transaction that is rolled back afterwards, which is
+# much cheaper than recreating the tables. Sessions join it with
+# join_transaction_mode="create_savepoint", so an endpoint's commit only
+# releases a SAVEPOINT and the next one starts a new SAVEPOINT.
+# Tests that read or write rows ask for it; the validation tests, which are
+# rejected before any query runs, skip the database altogether.
+@pytest.fixture
+async def db(setup_and_teardown):
+    async with test_engine.connect() as connection:
+        transaction = await connection.begin()
+        TestingSessionLocal.configure(bind=connection, join_transaction_mode="create_savepoint")
+        yield connection
+        TestingSessionLocal.configure(bind=test_engine, join_transaction_mode="conditional_savepoint")
+        await transaction.rollback()
+    # Cached product listings would outlive the rolled-back rows
+    await cache.delete_pattern("products:*")
+
+# Call the app in-process over ASGI, without TestClient's thread portal. The
+# app keeps no per-client state (no cookies), so one client serves every test.
+@pytest.fixture(scope="session")
+async def client(anyio_backend):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+# A session in the test's transaction, for tests that change rows directly
+@pytest.fixture
+async def db_session(db):
+    async with TestingSessionLocal() as session:
+        yield session
+
+# Insert users and products straight into the test's transaction, for tests
+# that only need them to exist; going through /signup/ and /addProduct costs
+# an HTTP round trip (and a password hash) per row
+@pytest.fixture(scope="session")
+def make_user():
+    # Each distinct password is hashed once for the whole run
+    hashes = {}
+
+    # password=None makes a user without one, like a Google account
+    async def make_user(email, password="password123"):
+        if password is not None and password not in hashes:
+            hashes[password] = pwd_context.hash(password)
+        async with TestingSessionLocal() as db:
+            user = User(email=email, password=hashes.get(password), cart=Cart())
+            db.add(user)
+            await db.commit()
+            return {"id": user.id, "email": user.email}
+    return make_user
+
+@pytest.fixture(scope="session")
+def make_product():
+    async def make_product(name, price, category="General", image="image_url"):
+        async with TestingSessionLocal() as db:
+            product = Product(name=name, category=category, image=image, price=price)
+            db.add(product)
+            await db.commit()
+            return {"id": product.id, "name": name, "category": category, "image": image, "price": price}
+    return make_product
+
+# What most cart tests start from: a user (with an empty cart), a product, and
+# two of that product in the user's cart
+@pytest.fixture
+async def user(db, make_user):
+    # No password: the cart tests never log in, so nothing needs hashing
+    return await make_user("cartuser@example.com", password=None)
+
+@pytest.fixture
+async def product(db, make_product):
+    return await make_product("Cart Product", 25.0)
+
+@pytest.fixture
+async def cart_item(db, user, product):
+    async with TestingSessionLocal() as session:
+        cart_id = await session.scalar(select(Cart.id).where(Cart.user_id == user["id"]))
+        item = CartItem(
+            cart_id=cart_id,
+            product_id=product["id"],
+            product_name=product["name"],
+            product_image=product["image"],
+            quantity=2,
+            price=product["price"],
+            total_price=2 * product["price"],
+        )
+        session.add(item)
+        await session.commit()
+        return {"id": item.id, "user_id": user["id"], "product_id": product["id"]}
+
+# Insert several products with one executemany, for tests that seed a listing
+@pytest.fixture(scope="session")
+def seed_products():
+    async def seed_products(rows):
+        async with TestingSessionLocal() as db:
+            await db.execute(insert(Product), rows)
+            await db.commit()
+    return seed_products
+
+# The endpoints must get their sessions from the test database (through the
+# transaction each test runs in), not from the app's own engine
+async def test_get_db_is_overridden(db):
+    assert app.dependency_overrides[get_db] is override_get_db
+    async for session in override_get_db():
+        assert session.bind is db
+
+# Valid request bodies for the validation tests, which drop one field at a time
+SIGNUP_PAYLOAD = {
+    "email": "missingfields@example.com",
+    "password": "testpassword123",
+    "confirm_password": "testpassword123"
+}
+LOGIN_PAYLOAD = {
+    "email": "loginuser@example.com",
+    "password": "testpassword123"
+}
+UPDATE_PASSWORD_PAYLOAD = {
+    "email": "missingfeilduser@example.com",
+    "current_password": "oldpassword123",
+    "new_password": "newpassword123",
+    "confirm_new_password": "newpassword123"
+}
+DELETE_USER_PAYLOAD = {
+    "email": "deleteuser@example.com",
+    "password": "password123"
+}
+PRODUCT_PAYLOAD = {
+    "name": "Test Product",
+    "description": "This is a test product.",
+    "image": "https://example.com/test-product.jpg",
+    "price": 19.99
+}
+
+# Copy of a request body without the given field
+def build_payload(payload, omit):
+    return {key: value for key, value in payload.items() if key != omit}
 
 # -------------------------------------------  USER  -------------------------------------------
 # __________________________________________
 # CREATE user (signup):
-def test_signup_success():
+async def test_signup_success(client, db):
     # Test successful user signup
-    response = client.post(
+    response = await client.post(
         "/signup/",
         json={
             "email": "testuser@example.com",
@@ -51,21 +241,15 @@ def test_signup_success():
         }
     )
     assert response.status_code == 200
-    assert response.json()["email"] == "testuser@example.com"
-    assert "id" in response.json()  # Ensure the response contains an ID
+    body = response.json()
+    assert body["email"] == "testuser@example.com"
+    assert "id" in body  # Ensure the response contains an ID
 
-def test_signup_duplicate_email():
+async def test_signup_duplicate_email(client, db, make_user):
     # Test signup with an email that is already registered
-    client.post(
-        "/signup/",
-        json={
-            "email": "testuser@example.com",
-            "password": "testpassword123",
-            "confirm_password": "testpassword123"
-        }
-    )
+    await make_user("testuser@example.com", "testpassword123")
     # Attempt to sign up with the same email again
-    response = client.post(
+    response = await client.post(
         "/signup/",
         json={
             "email": "testuser@example.com",
@@ -76,9 +260,9 @@ def test_signup_duplicate_email():
     assert response.status_code == 400
     assert response.json()["detail"] == "Email already registered"
 
-def test_signup_password_mismatch():
+async def test_signup_password_mismatch(client):
     # Test signup with mismatched passwords
-    response = client.post(
+    response = await client.post(
         "/signup/",
         json={
             "email": "newuser@example.com",
@@ -88,39 +272,27 @@ def test_signup_password_mismatch():
     )
     assert response.status_code == 422
     # Update assertion to match the actual error message
-    assert any(
-        error["msg"] == "Value error, Passwords do not match"
-        for error in response.json()["detail"]
-    )
+    assert response.json()["detail"][0]["msg"] == "Value error, Passwords do not match"
 
-def test_signup_missing_fields():
-    # Test signup with missing fields
-    response = client.post(
+@pytest.mark.parametrize("missing_field", ["email", "password", "confirm_password"])
+async def test_signup_missing_fields(client, missing_field):
+    # Test signup with each of the fields missing in turn
+    response = await client.post(
         "/signup/",
-        json={
-            "email": "missingfields@example.com",
-            "password": "testpassword123"
-            # Missing confirm_password
-        }
+        json=build_payload(SIGNUP_PAYLOAD, omit=missing_field)
     )
     assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "confirm_password"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
+    body = response.json()
+    assert body["detail"][0]["loc"] == ["body", missing_field]
+    assert body["detail"][0]["msg"] == "Field required"
 
 # __________________________________________
 # READ user (login):
-def test_login_success():
-    client.post(
-        "/signup/",
-        json={
-            "email": "loginuser@example.com",
-            "password": "testpassword123",
-            "confirm_password": "testpassword123"
-        }
-    )
+async def test_login_success(client, db, make_user):
+    await make_user("loginuser@example.com", "testpassword123")
     
     # Test successful user login
-    response = client.post(
+    response = await client.post(
         "/login/",
         json={
             "email": "loginuser@example.com",
@@ -128,13 +300,14 @@ def test_login_success():
         }
     )
     assert response.status_code == 200
-    assert response.json()["message"] == "Login successful"
-    assert "user_id" in response.json()
-    assert response.json()["email"] == "loginuser@example.com"
+    body = response.json()
+    assert body["message"] == "Login successful"
+    assert "user_id" in body
+    assert body["email"] == "loginuser@example.com"
 
-def test_login_invalid_credentials():
+async def test_login_invalid_credentials(client, db):
     # Test login with invalid credentials
-    response = client.post(
+    response = await client.post(
         "/login/",
         json={
             "email": "nonexistentuser@example.com",
@@ -144,19 +317,12 @@ def test_login_invalid_credentials():
     assert response.status_code == 401
     assert response.json()["detail"] == "Invalid credentials"
 
-def test_login_wrong_password():
+async def test_login_wrong_password(client, db, make_user):
     # First, sign up a user to test login with wrong password
-    client.post(
-        "/signup/",
-        json={
-            "email": "wrongpassworduser@example.com",
-            "password": "correctpassword",
-            "confirm_password": "correctpassword"
-        }
-    )
+    await make_user("wrongpassworduser@example.com", "correctpassword")
     
     # Test login with wrong password
-    response = client.post(
+    response = await client.post(
         "/login/",
         json={
             "email": "wrongpassworduser@example.com",
@@ -166,48 +332,26 @@ def test_login_wrong_password():
     assert response.status_code == 401
     assert response.json()["detail"] == "Invalid credentials"
 
-def test_login_missing_email():
-    # Test login with missing email
-    response = client.post(
+@pytest.mark.parametrize("missing_field", ["email", "password"])
+async def test_login_missing_fields(client, missing_field):
+    # Test login with the email or the password missing
+    response = await client.post(
         "/login/",
-        json={
-            "password": "testpassword123"
-            # Missing email
-        }
+        json=build_payload(LOGIN_PAYLOAD, omit=missing_field)
     )
     assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "email"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
-
-def test_login_missing_password():
-    # Test login with missing password
-    response = client.post(
-        "/login/",
-        json={
-            "email": "loginuser@example.com"
-            # Missing password
-        }
-    )
-    assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "password"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
-
+    body = response.json()
+    assert body["detail"][0]["loc"] == ["body", missing_field]
+    assert body["detail"][0]["msg"] == "Field required"
 
 # __________________________________________
 # UPDATE user (change password):
-def test_update_password_success():
+async def test_update_password_success(client, db, make_user):
     # signing up a user to test password update
-    client.post(
-        "/signup/",
-        json={
-            "email": "updateuser@example.com",
-            "password": "oldpassword123",
-            "confirm_password": "oldpassword123"
-        }
-    )
+    await make_user("updateuser@example.com", "oldpassword123")
     
     # Test successful password update
-    response = client.put(
+    response = await client.put(
         "/updatePassword/",
         json={
             "email": "updateuser@example.com",
@@ -219,19 +363,12 @@ def test_update_password_success():
     assert response.status_code == 200
     assert response.json()["message"] == "Password updated successfully"
 
-def test_update_password_invalid_current_password():
+async def test_update_password_invalid_current_password(client, db, make_user):
     # signing up a user to test invalid password update
-    client.post(
-        "/signup/",
-        json={
-            "email": "invalidpassworduser@example.com",
-            "password": "correctpassword",
-            "confirm_password": "correctpassword"
-        }
-    )
+    await make_user("invalidpassworduser@example.com", "correctpassword")
     
     # Test password update with incorrect current password
-    response = client.put(
+    response = await client.put(
         "/updatePassword/",
         json={
             "email": "invalidpassworduser@example.com",
@@ -243,19 +380,9 @@ def test_update_password_invalid_current_password():
     assert response.status_code == 401
     assert response.json()["detail"] == "Invalid email or current password"
 
-def test_update_password_mismatch():
-    # signing up a user to test invalid password update
-    client.post(
-        "/signup/",
-        json={
-            "email": "mismatchuser@example.com",
-            "password": "oldpassword123",
-            "confirm_password": "oldpassword123"
-        }
-    )
-    
+async def test_update_password_mismatch(client):
     # Test password update with mismatched new passwords
-    response = client.put(
+    response = await client.put(
         "/updatePassword/",
         json={
             "email": "mismatchuser@example.com",
@@ -265,51 +392,28 @@ def test_update_password_mismatch():
         }
     )
     assert response.status_code == 422
-    assert any(
-        error["msg"] == "Value error, New passwords do not match"
-        for error in response.json()["detail"]
-    )
+    assert response.json()["detail"][0]["msg"] == "Value error, New passwords do not match"
 
-def test_update_password_missing_new_passwords():
-    # signing up a user to test invalid password update
-    client.post(
-        "/signup/",
-        json={
-            "email": "missingfeilduser@example.com",
-            "password": "oldpassword123",
-            "confirm_password": "oldpassword123"
-        }
-    )
-    
-    # Test password update with mismatched new passwords
-    response = client.put(
+@pytest.mark.parametrize("missing_field", ["email", "current_password", "new_password", "confirm_new_password"])
+async def test_update_password_missing_fields(client, missing_field):
+    # Test password update with each of the fields missing in turn
+    response = await client.put(
         "/updatePassword/",
-        json={
-            "email": "missingfeilduser@example.com",
-            "current_password": "oldpassword123"
-            # new password and confirm password missing
-        }
+        json=build_payload(UPDATE_PASSWORD_PAYLOAD, omit=missing_field)
     )
     assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "new_password"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
+    body = response.json()
+    assert body["detail"][0]["loc"] == ["body", missing_field]
+    assert body["detail"][0]["msg"] == "Field required"
 
 # __________________________________________
 # DELETE user: (removing a user)
-def test_delete_user_success():
+async def test_delete_user_success(client, db, make_user):
     # Signing up a new user to test deletion
-    signup_response = client.post(
-        "/signup/",
-        json={
-            "email": "deleteuser@example.com",
-            "password": "password123",
-            "confirm_password": "password123"
-        }
-    )
-    assert signup_response.status_code == 200
+    await make_user("deleteuser@example.com")
 
     # Delete the user
-    delete_response = client.request(
+    delete_response = await client.request(
         "DELETE",
         "/removeUser/",
         json={
@@ -320,19 +424,11 @@ def test_delete_user_success():
     assert delete_response.status_code == 200
     assert delete_response.json() == {"message": "User and associated data successfully deleted"}
 
-def test_delete_user_invalid_password():
+async def test_delete_user_invalid_password(client, db, make_user):
     # Signing up a new user to test deletion
-    signup_response = client.post(
-        "/signup/",
-        json={
-            "email": "deleteuser@example.com",
-            "password": "password123",
-            "confirm_password": "password123"
-        }
-    )
-    assert signup_response.status_code == 200
+    await make_user("deleteuser@example.com")
     # Attempt to delete a user with invalid password
-    delete_response = client.request(
+    delete_response = await client.request(
         "DELETE",
         "/removeUser/",
         json={
@@ -343,38 +439,24 @@ def test_delete_user_invalid_password():
     assert delete_response.status_code == 401
     assert delete_response.json()["detail"] == "Invalid email or password"
 
-def test_delete_user_missing_fields():
-    # Attempt to delete a user with missing password
-    delete_response = client.request(
-        "DELETE",
-        "/removeUser/",
-        json={
-            "email": "deleteuser@example.com"
-            # Missing password field
-        }
-    )
-    assert delete_response.status_code == 422
-    assert delete_response.json()["detail"][0]["loc"] == ["body", "password"]
-    assert delete_response.json()["detail"][0]["msg"] == "Field required"
-
-    # Attempt to delete a user with missing email
-    delete_response = client.request(
+@pytest.mark.parametrize("missing_field", ["email", "password"])
+async def test_delete_user_missing_fields(client, missing_field):
+    # Attempt to delete a user with the email or the password missing
+    delete_response = await client.request(
         "DELETE",
         "/removeUser/",
-        json={
-            "password": "password123"
-            # Missing email field
-        }
+        json=build_payload(DELETE_USER_PAYLOAD, omit=missing_field)
     )
     assert delete_response.status_code == 422
-    assert delete_response.json()["detail"][0]["loc"] == ["body", "email"]
-    assert delete_response.json()["detail"][0]["msg"] == "Field required"
+    body = delete_response.json()
+    assert body["detail"][0]["loc"] == ["body", missing_field]
+    assert body["detail"][0]["msg"] == "Field required"
 
 # -------------------------------------------  PRODUCT  -------------------------------------------
 # __________________________________________
 # CREATE product: (adding a new product)
-def test_create_product_success():
-    response = client.post(
+async def test_create_product_success(client, db):
+    response = await client.post(
         "/products/addProduct/",
         json={
             "name": "Test Product",
@@ -390,51 +472,20 @@ def test_create_product_success():
     assert data["price"] == 29.99
     assert "id" in data 
 
-def test_create_product_missing_fields():
-    response = client.post(
+@pytest.mark.parametrize("missing_field", ["name", "image", "price"])
+async def test_create_product_missing_fields(client, missing_field):
+    response = await client.post(
         "/products/addProduct/",
-        json={
-            # "name": "Test Product",  # Name is missing
-            "description": "This product has no name.",
-            "image": "https://example.com/test-product.jpg",
-            "price": 19.99
-        }
-    )
-    assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "name"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
-
-def test_create_product_missing_image():
-    response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Test Product",
-            "description": "This is a test product.",
-            # "image": "https://example.com/test-product.jpg",  # Image URL is missing
-            "price": 19.99
-        }
-    )
-    assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "image"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
-
-def test_create_product_missing_price():
-    response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Test Product",
-            "description": "This is a test product.",
-            "image": "https://example.com/test-product.jpg",
-            # "price": 19.99  # Price is missing
-        }
+        json=build_payload(PRODUCT_PAYLOAD, omit=missing_field)
     )
     assert response.status_code == 422
-    assert response.json()["detail"][0]["loc"] == ["body", "price"]
-    assert response.json()["detail"][0]["msg"] == "Field required"
+    body = response.json()
+    assert body["detail"][0]["loc"] == ["body", missing_field]
+    assert body["detail"][0]["msg"] == "Field required"
 
-def test_create_product_invalid_price():
+async def test_create_product_invalid_price(client):
     # Testing with string value for price
-    response = client.post(
+    response = await client.post(
         "/products/addProduct/",
         json={
             "name": "Test Product",
@@ -448,29 +499,15 @@ def test_create_product_invalid_price():
 
 # __________________________________________
 # READ product: (get all products, by id, by name)
-def test_read_all_products_success():
+async def test_read_all_products_success(client, db, seed_products):
     # Add products to the database for testing
-    client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Product 1",
-            "description": "Description 1",
-            "image": "https://example.com/product1.jpg",
-            "price": 19.99
-        }
-    )
-    client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Product 2",
-            "description": "Description 2",
-            "image": "https://example.com/product2.jpg",
-            "price": 29.99
-        }
-    )
+    await seed_products([
+        {"name": "Product 1", "category": "General", "image": "https://example.com/product1.jpg", "price": 19.99},
+        {"name": "Product 2", "category": "General", "image": "https://example.com/product2.jpg", "price": 29.99},
+    ])
     
     # Test reading all products
-    response = client.get("/products/allProducts")
+    response = await client.get("/products/allProducts")
     assert response.status_code == 200
     data = response.json()
     
@@ -478,28 +515,20 @@ def test_read_all_products_success():
     assert data[0]["name"] == "Product 1"
     assert data[1]["name"] == "Product 2"
 
-def test_read_all_products_empty():
+async def test_read_all_products_empty(client, db):
     # Ensure the database is empty
-    response = client.get("/products/allProducts")
+    response = await client.get("/products/allProducts")
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 0  # Expecting no products
 
-def test_read_product_by_id_success():
+async def test_read_product_by_id_success(client, db, make_product):
     # Add a product to the database for testing
-    create_response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Test Product",
-            "description": "This is a test product.",
-            "image": "https://example.com/test-product.jpg",
-            "price": 29.99
-        }
-    )
-    product_id = create_response.json()["id"]
+    product = await make_product("Test Product", 29.99, image="https://example.com/test-product.jpg")
+    product_id = product["id"]
     
     # Test retrieving the product by ID
-    response = client.get(f"/products/byId/{product_id}")
+    response = await client.get(f"/products/byId/{product_id}")
     assert response.status_code == 200
     data = response.json()
     
@@ -507,71 +536,49 @@ def test_read_product_by_id_success():
     assert data["description"] == "This is a test product."
     assert data["price"] == 29.99
 
-def test_read_product_by_invalid_id():
+async def test_read_product_by_invalid_id(client, db):
     # Test retrieving a product with an invalid ID
-    response = client.get("/products/byId/9999")  # Assuming ID 9999 doesn't exist
+    response = await client.get("/products/byId/9999")  # Assuming ID 9999 doesn't exist
     assert response.status_code == 404
     assert response.json()["detail"] == "Product not found"
 
-def test_read_products_by_name_success():
+async def test_read_products_by_name_success(client, db, seed_products):
     # Add products to the database for testing
-    client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Product 1",
-            "description": "Poduct 1 for testing",
-            "image": "https://example.com/unique-product.jpg",
-            "price": 39.99
-        }
-    )
-    client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Product 2",
-            "description": "Poduct 1 for testing",
-            "image": "https://example.com/another-product.jpg",
-            "price": 49.99
-        }
-    )
+    await seed_products([
+        {"name": "Product 1", "category": "General", "image": "https://example.com/unique-product.jpg", "price": 39.99},
+        {"name": "Product 2", "category": "General", "image": "https://example.com/another-product.jpg", "price": 49.99},
+    ])
     
     # Test retrieving products by name
-    response = client.get("/products/byName/?name=Product 1")
+    response = await client.get("/products/byName/?name=Product 1")
     assert response.status_code == 200
     data = response.json()
     
     assert len(data) == 1
     assert data[0]["name"] == "Product 1"
 
-def test_read_products_by_name_no_matches():
+async def test_read_products_by_name_no_matches(client, db):
     # Test retrieving products by a name that doesn't match any product
-    response = client.get("/products/byName/?name=Nonexistent")
+    response = await client.get("/products/byName/?name=Nonexistent")
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 0  # No products should match
 
-def test_read_products_by_name_missing_query():
+async def test_read_products_by_name_missing_query(client):
     # Test retrieving products without a name query parameter
-    response = client.get("/products/byName/")
+    response = await client.get("/products/byName/")
     assert response.status_code == 400
     assert response.json()["detail"] == "Query parameter 'name' is required"
 
 # __________________________________________
 # UPDATE product: (update any of the entery of a product)
-def test_update_product_success():
+async def test_update_product_success(client, db, make_product):
     # First, create a product to update
-    create_response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Old Product",
-            "description": "Old description",
-            "image": "https://example.com/old-product.jpg",
-            "price": 19.99
-        }
-    )
-    product_id = create_response.json()["id"]
+    product = await make_product("Old Product", 19.99, image="https://example.com/old-product.jpg")
+    product_id = product["id"]
 
     # Update the product with new details
-    update_response = client.put(
+    update_response = await client.put(
         f"/products/updateProduct/{product_id}",
         json={
             "name": "Updated Product",
@@ -590,73 +597,53 @@ def test_update_product_success():
     assert "id" in data
     assert data["id"] == product_id
 
+# Prices have to fit the Numeric(10, 2) column
+@pytest.mark.parametrize("price,error", [
+    ("19.999", "decimal_max_places"),  # more than 2 decimal places
+    ("123456789.99", "decimal_max_digits"),  # more than 10 digits
+])
+async def test_update_product_invalid_price(client, product, price, error):
+    response = await client.put(
+        f"/products/updateProduct/{product['id']}",
+        json={"name": "Updated Product", "category": "General", "price": price}
+    )
+    assert response.status_code == 422
+    body = response.json()
+    assert body["detail"][0]["loc"] == ["body", "price"]
+    assert body["detail"][0]["type"] == error
+
 # __________________________________________
 # DELETE product: (Remove a product)
-def test_delete_product_success():
+async def test_delete_product_success(client, db, make_product):
     # Create a product to delete
-    response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Product to Delete",
-            "description": "This product will be deleted",
-            "image": "https://example.com/product-to-delete.jpg",
-            "price": 9.99
-        }
-    )
-    assert response.status_code == 200
-    product_id = response.json()["id"]
+    product = await make_product("Product to Delete", 9.99, image="https://example.com/product-to-delete.jpg")
+    product_id = product["id"]
 
     # Delete the product
-    delete_response = client.delete(f"/products/remove/{product_id}")
+    delete_response = await client.delete(f"/products/remove/{product_id}")
     assert delete_response.status_code == 200
     assert delete_response.json() == {"detail": "Product deleted successfully"}
 
     # Verify the product is deleted
-    get_response = client.get(f"/products/byId/{product_id}")
+    get_response = await client.get(f"/products/byId/{product_id}")
     assert get_response.status_code == 404
     assert get_response.json() == {"detail": "Product not found"}
 
-def test_delete_product_not_found():
+async def test_delete_product_not_found(client, db):
     non_existent_product_id = 9999  # Use an ID that is not present in the database
-    response = client.delete(f"/products/remove/{non_existent_product_id}")
+    response = await client.delete(f"/products/remove/{non_existent_product_id}")
     assert response.status_code == 404
     assert response.json() == {"detail": "Product not found"}
 
 # -------------------------------------------  CART & CART-ITEMS  -------------------------------------------
 # __________________________________________
 # add product to cart:
-def test_add_to_cart():
-    # Create a user
-    response = client.post(
-        "/signup/",
-        json={
-            "email": "john@example.com",
-            "password": "password123",
-            "confirm_password": "password123",
-        },
-    )
-    assert response.status_code == 200  # Ensure the request is successful
-    user = response.json()
-    assert "id" in user  # Check if the user response contains an 'id'
+async def test_add_to_cart(client, user, product):
     user_id = user["id"]
-
-    # Create a product
-    response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Sample Product",
-            "description": "A great product",
-            "image": "image_url",
-            "price": 100.0,
-        },
-    )
-    assert response.status_code == 200
-    product = response.json()
-    assert "id" in product
     product_id = product["id"]
 
     # Add product to cart
-    response = client.post(
+    response = await client.post(
         "/cart/add",
         json={"user_id": user_id, "product_id": product_id, "quantity": 2},
     )
@@ -664,81 +651,48 @@ def test_add_to_cart():
     cart = response.json()
 
     # Assert the cart details
-    assert cart["total_price"] == 200.0
+    assert cart["total_price"] == 50.0
     assert len(cart["items"]) == 1
     assert cart["items"][0]["product_id"] == product_id
     assert cart["items"][0]["quantity"] == 2
-    assert cart["items"][0]["total_price"] == 200.0
+    assert cart["items"][0]["total_price"] == 50.0
 
-def test_add_to_cart_user_not_found():
-    # Try adding a product to a cart for a non-existent user
-    response = client.post(
-        "/cart/add",
-        json={
-            "user_id": 99999,  # Non-existent user ID
-            "product_id": 1,
-            "quantity": 1,
-        },
-    )
-    assert response.status_code == 404
-    assert response.json()["detail"] == "User not found"
+async def test_add_to_cart_again_after_price_change(client, cart_item, db_session):
+    # The product's price changes after two units are in the cart
+    product = await db_session.get(Product, cart_item["product_id"])
+    product.price = 3.33
+    await db_session.flush()
 
-def test_add_to_cart_product_not_found():
-    # Create a user
-    response = client.post(
-        "/signup/",
-        json={
-            "email": "jane@example.com",
-            "password": "password123",
-            "confirm_password": "password123",
-        },
+    # Adding one more charges the new price for that unit only
+    response = await client.post(
+        "/cart/add",
+        json={"user_id": cart_item["user_id"], "product_id": cart_item["product_id"], "quantity": 1},
     )
     assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
+    cart = response.json()
+    assert cart["items"][0]["quantity"] == 3
+    assert cart["items"][0]["total_price"] == 53.33
+    assert cart["total_price"] == 53.33
 
-    # Try adding a non-existent product to a cart
-    response = client.post(
+async def test_add_to_cart_user_not_found(client, db):
+    # Try adding a product to a cart for a non-existent user
+    response = await client.post(
         "/cart/add",
         json={
-            "user_id": user_id,
-            "product_id": 99999,  # Non-existent product ID
+            "user_id": 99999,  # Non-existent user ID
+            "product_id": 1,
             "quantity": 1,
         },
     )
     assert response.status_code == 404
-    assert response.json()["detail"] == "Product not found"
+    assert response.json()["detail"] == "User not found"
 
-def test_add_to_cart_invalid_quantity():
-    # Create a user
-    response = client.post(
-        "/signup/",
-        json={
-            "email": "doe@example.com",
-            "password": "password123",
-            "confirm_password": "password123",
-        },
-    )
-    assert response.status_code == 200
-    user = response.json()
+async def test_add_to_cart_invalid_quantity(client, user, product):
     user_id = user["id"]
-
-    # Create a product
-    response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Another Product",
-            "description": "Another great product",
-            "image": "another_image_url",
-            "price": 50.0,
-        },
-    )
-    assert response.status_code == 200
-    product = response.json()
     product_id = product["id"]
 
     # Try adding the product to cart with invalid quantity
-    response = client.post(
+    response = await client.post(
         "/cart/add",
         json={
             "user_id": user_id,
@@ -750,7 +704,7 @@ def test_add_to_cart_invalid_quantity():
     assert response.json()["detail"] == "Quantity must be greater than zero"
 
     # Try adding the product to cart with negative quantity
-    response = client.post(
+    response = await client.post(
         "/cart/add",
         json={
             "user_id": user_id,
@@ -761,71 +715,48 @@ def test_add_to_cart_invalid_quantity():
     assert response.status_code == 400  # Expecting 400 Bad Request
     assert response.json()["detail"] == "Quantity must be greater than zero"
 
-# __________________________________________
-# READ: View cart items
-def test_view_cart_with_items():
-    # Create a user
-    response = client.post(
-        "/signup/",
-        json={
-            "email": "john@example.com",
-            "password": "password123",
-            "confirm_password": "password123",
-        },
-    )
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Create a product
-    response = client.post(
-        "/products/addProduct/",
-        json={
-            "name": "Sample Product",
-            "description": "A great product",
-            "image": "image_url",
-            "price": 100.0,
-        },
-    )
+# Add to a cart item's quantity, or remove the item with a negative quantity
+async def test_update_cart_adds_quantity(client, cart_item):
+    response = await client.post("/cart/update", json={
+        "user_id": cart_item["user_id"],
+        "product_id": cart_item["product_id"],
+        "quantity": 1
+    })
     assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
+    cart = response.json()
+    assert cart["total_price"] == 75.0
+    assert len(cart["items"]) == 1
+    assert cart["items"][0]["quantity"] == 3
 
-    # Add product to cart
-    response = client.post(
-        "/cart/add",
-        json={"user_id": user_id, "product_id": product_id, "quantity": 2},
-    )
+async def test_update_cart_negative_quantity_removes_item(client, cart_item):
+    response = await client.post("/cart/update", json={
+        "user_id": cart_item["user_id"],
+        "product_id": cart_item["product_id"],
+        "quantity": -1
+    })
     assert response.status_code == 200
+    cart = response.json()
+    assert cart["total_price"] == 0.0
+    assert len(cart["items"]) == 0
 
+# __________________________________________
+# READ: View cart items
+async def test_view_cart_with_items(client, cart_item):
     # View the cart
-    response = client.get(f"/cart/?user_id={user_id}")
+    response = await client.get(f"/cart/?user_id={cart_item['user_id']}")
     assert response.status_code == 200
     cart = response.json()
 
     # Assert the cart details
-    assert cart["total_price"] == 200.0
+    assert cart["total_price"] == 50.0
     assert len(cart["items"]) == 1
-    assert cart["items"][0]["product_id"] == product_id
+    assert cart["items"][0]["product_id"] == cart_item["product_id"]
     assert cart["items"][0]["quantity"] == 2
-    assert cart["items"][0]["total_price"] == 200.0
-
-def test_view_empty_cart():
-    # Create a user
-    response = client.post(
-        "/signup/",
-        json={
-            "email": "jane@example.com",
-            "password": "password123",
-            "confirm_password": "password123",
-        },
-    )
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
+    assert cart["items"][0]["total_price"] == 50.0
 
+async def test_view_empty_cart(client, user):
     # View the cart
-    response = client.get(f"/cart/?user_id={user_id}")
+    response = await client.get(f"/cart/?user_id={user['id']}")
     assert response.status_code == 200
     cart = response.json()
 
@@ -833,158 +764,57 @@ def test_view_empty_cart():
     assert cart["total_price"] == 0.0
     assert len(cart["items"]) == 0
 
-def test_view_cart_user_not_found():
+async def test_view_cart_user_not_found(client, db):
     # Attempt to view a cart for a non-existent user
-    response = client.get("/cart/?user_id=99999")  # Non-existent user ID
+    response = await client.get("/cart/?user_id=99999")  # Non-existent user ID
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found"
 
-def test_view_cart_cart_not_found():
-    # Create a user without a cart
-    response = client.post(
-        "/signup/",
-        json={
-            "email": "doe@example.com",
-            "password": "password123",
-            "confirm_password": "password123",
-        },
-    )
-    assert response.status_code == 200
-    user = response.json()
+async def test_view_cart_cart_not_found(client, user, db_session):
     user_id = user["id"]
 
-    # Directly delete the cart to simulate cart not found
-    db = next(override_get_db())
-    db_user = db.query(User).filter(User.id == user_id).first()
-    db.delete(db_user.cart)
-    db.commit()
+    # Directly delete the cart to simulate cart not found; flushing is enough
+    # for the endpoint to see it, as it runs in the same transaction
+    cart = await db_session.scalar(select(Cart).where(Cart.user_id == user_id))
+    await db_session.delete(cart)
+    await db_session.flush()
 
     # Attempt to view the cart
-    response = client.get(f"/cart/?user_id={user_id}")
+    response = await client.get(f"/cart/?user_id={user_id}")
     assert response.status_code == 404
     assert response.json()["detail"] == "Cart not found"
 
 # __________________________________________
 # # UPDATE cart item (uodate quantity)
-def test_update_cart_item_success():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "updateuser@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Create a product
-    response = client.post("/products/addProduct/", json={
-        "name": "Product Update Test",
-        "description": "A product for testing update",
-        "image": "image_url",
-        "price": 50.0
-    })
-    assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
-
-    # Add product to cart
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": 2
-    })
-    assert response.status_code == 200
-    cart = response.json()
-    cart_item_id = cart["items"][0]["id"]
-
+async def test_update_cart_item_success(client, cart_item):
     # Update the cart item
-    response = client.put(f"/cart/update/{cart_item_id}", json={
+    response = await client.put(f"/cart/update/{cart_item['id']}", json={
         "quantity": 3
-    }, params={"user_id": user_id})
+    }, params={"user_id": cart_item["user_id"]})
     assert response.status_code == 200
     updated_cart = response.json()
 
     # Assert the cart item details
-    assert updated_cart["total_price"] == 150.0
+    assert updated_cart["total_price"] == 75.0
     assert len(updated_cart["items"]) == 1
     assert updated_cart["items"][0]["quantity"] == 3
-    assert updated_cart["items"][0]["total_price"] == 150.0
-
-def test_update_cart_item_not_found():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "cartitemnotfound@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Try updating a non-existent cart item
-    response = client.put("/cart/update/99999", json={
-        "quantity": 3
-    }, params={"user_id": user_id})
-    assert response.status_code == 404
-    assert response.json()["detail"] == "Cart item not found"
-
-def test_update_cart_item_product_not_found():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "productnotfound@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
+    assert updated_cart["items"][0]["total_price"] == 75.0
 
+async def test_update_cart_item_product_not_found(client, user):
     # Add product to cart
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
+    response = await client.post("/cart/add", json={
+        "user_id": user["id"],
         "product_id": 1,  # Assuming this product_id does not exist
         "quantity": 2
     })
     assert response.status_code == 404
     assert response.json()["detail"] == "Product not found"
 
-def test_update_cart_item_invalid_quantity():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "invalidquantity@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Create a product
-    response = client.post("/products/addProduct/", json={
-        "name": "Invalid Quantity Product",
-        "description": "A product for testing invalid quantity",
-        "image": "image_url",
-        "price": 70.0
-    })
-    assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
-
-    # Add product to cart
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": 2
-    })
-    assert response.status_code == 200
-    cart = response.json()
-    cart_item_id = cart["items"][0]["id"]
-
+async def test_update_cart_item_invalid_quantity(client, cart_item):
     # Try updating the cart item with invalid quantity
-    response = client.put(f"/cart/update/{cart_item_id}", json={
+    response = await client.put(f"/cart/update/{cart_item['id']}", json={
         "quantity": -1
-    }, params={"user_id": user_id})
+    }, params={"user_id": cart_item["user_id"]})
     
     # Check for invalid quantity response
     assert response.status_code == 400
@@ -992,189 +822,69 @@ def test_update_cart_item_invalid_quantity():
 
 #  __________________________________________
 # DELETE item from cart
-def test_remove_cart_item_success():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "deleteitem@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Create a product
-    response = client.post("/products/addProduct/", json={
-        "name": "Removable Product",
-        "description": "A product to be removed",
-        "image": "image_url",
-        "price": 50.0
-    })
-    assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
-
-    # Add product to cart
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": 2
-    })
-    assert response.status_code == 200
-    cart = response.json()
-    cart_item_id = cart["items"][0]["id"]
-
+async def test_remove_cart_item_success(client, cart_item):
     # Remove the cart item
-    response = client.delete(f"/cart/remove?item_id={cart_item_id}&user_id={user_id}")
+    response = await client.delete(f"/cart/remove?item_id={cart_item['id']}&user_id={cart_item['user_id']}")
     assert response.status_code == 200
     updated_cart = response.json()
     assert len(updated_cart["items"]) == 0
     assert updated_cart["total_price"] == 0.0
 
-def test_remove_cart_item_not_found():
-    # Attempt to remove a non-existent cart item
-    response = client.delete("/cart/remove", params={
-        "item_id": 9999,  # Assuming 9999 does not exist
-        "user_id": 1  # Assuming user_id 1 exists
-    })
-    assert response.status_code == 404
-    assert response.json()["detail"] == "Cart item not found"
-
-def test_remove_cart_item_user_not_found():
-    # Create a product
-    response = client.post("/products/addProduct/", json={
-        "name": "Product to Remove",
-        "description": "A product for testing",
-        "image": "image_url",
-        "price": 75.0
-    })
-    assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
-
-    # Create a user and add a product to cart
-    response = client.post("/signup/", json={
-        "email": "userforremoval@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": 1
-    })
-    assert response.status_code == 200
-    cart = response.json()
-    cart_item_id = cart["items"][0]["id"]
-
+async def test_remove_cart_item_user_not_found(client, cart_item):
     # Attempt to remove the cart item with a non-existent user
-    response = client.delete(f"/cart/remove?item_id={cart_item_id}&user_id=9999")  # Assuming 9999 does not exist
+    response = await client.delete(f"/cart/remove?item_id={cart_item['id']}&user_id=9999")  # Assuming 9999 does not exist
     assert response.status_code == 404
     assert response.json()["detail"] == "Cart not found"
 
 #  __________________________________________
 # INCREMENT an item
-def test_increment_cart_item_success():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "incrementuser@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Create a product
-    response = client.post("/products/addProduct/", json={
-        "name": "Increment Product",
-        "description": "A product to increment",
-        "image": "image_url",
-        "price": 25.0
-    })
-    assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
-
-    # Add product to cart
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": 1
-    })
-    assert response.status_code == 200
-    cart = response.json()
-    cart_item_id = cart["items"][0]["id"]
-
+async def test_increment_cart_item_success(client, cart_item):
     # Increment the cart item
-    response = client.put("/cart/increment", json={
-        "item_id": cart_item_id,
-        "user_id": user_id
+    response = await client.put("/cart/increment", json={
+        "item_id": cart_item["id"],
+        "user_id": cart_item["user_id"]
     })
     assert response.status_code == 200
     updated_cart = response.json()
-    assert updated_cart["total_price"] == 50.0  # Price should be updated to 25.0 * 2
+    assert updated_cart["total_price"] == 75.0  # Price should be updated to 25.0 * 3
     assert len(updated_cart["items"]) == 1
-    assert updated_cart["items"][0]["quantity"] == 2  # Quantity should be incremented
-
-def test_increment_cart_item_not_found():
-    # Attempt to increment a non-existent cart item
-    response = client.put("/cart/increment", json={
-        "item_id": 9999,  # Assuming this ID does not exist
-        "user_id": 1  # Assuming this user ID exists
-    })
-    assert response.status_code == 404
-    assert response.json()["detail"] == "Cart item not found"
+    assert updated_cart["items"][0]["quantity"] == 3  # Quantity should be incremented
 
 #  __________________________________________
 # DECREMENT an item
-def test_decrement_cart_item_success():
-    # Create a user
-    response = client.post("/signup/", json={
-        "email": "decrementuser@example.com",
-        "password": "password123",
-        "confirm_password": "password123"
-    })
-    assert response.status_code == 200
-    user = response.json()
-    user_id = user["id"]
-
-    # Create a product
-    response = client.post("/products/addProduct/", json={
-        "name": "Decrement Product",
-        "description": "A product to decrement",
-        "image": "image_url",
-        "price": 30.0
-    })
-    assert response.status_code == 200
-    product = response.json()
-    product_id = product["id"]
-
-    # Add product to cart
-    response = client.post("/cart/add", json={
-        "user_id": user_id,
-        "product_id": product_id,
-        "quantity": 2
-    })
-    assert response.status_code == 200
-    cart = response.json()
-    cart_item_id = cart["items"][0]["id"]
-
+async def test_decrement_cart_item_success(client, cart_item):
     # Decrement the cart item
-    response = client.put("/cart/decrement", json={
-        "item_id": cart_item_id,
-        "user_id": user_id
+    response = await client.put("/cart/decrement", json={
+        "item_id": cart_item["id"],
+        "user_id": cart_item["user_id"]
     })
     assert response.status_code == 200
     updated_cart = response.json()
-    assert updated_cart["total_price"] == 30.0  # Price should be updated to 30.0
+    assert updated_cart["total_price"] == 25.0  # Price should be updated to 25.0
     assert len(updated_cart["items"]) == 1
     assert updated_cart["items"][0]["quantity"] == 1  # Quantity should be decremented to 1
 
+#  __________________________________________
+# Products and cart items that don't exist
+# (method, url, query params, JSON body, expected detail); the user's id is
+# added to the query params for update/remove and to the body for the others
+@pytest.mark.parametrize("method,url,params,body,detail", [
+    ("POST", "/cart/add", None, {"product_id": 99999, "quantity": 1}, "Product not found"),
+    ("PUT", "/cart/update/99999", {}, {"quantity": 3}, "Cart item not found"),
+    ("DELETE", "/cart/remove", {"item_id": 9999}, None, "Cart item not found"),
+    ("PUT", "/cart/increment", None, {"item_id": 9999}, "Cart item not found"),
+    ("PUT", "/cart/decrement", None, {"item_id": 9999}, "Cart item not found"),
+])
+async def test_cart_not_found(client, user, method, url, params, body, detail):
+    if params is not None:
+        params = {**params, "user_id": user["id"]}
+    else:
+        body = {**body, "user_id": user["id"]}
+
+    response = await client.request(method, url, params=params, json=body)
+    assert response.status_code == 404
+    assert response.json()["detail"] == detail
+
 # -------------------------------------------  ORDER & ORDER-ITEMS  -------------------------------------------
 # __________________________________________
 # CREATE order:
@@ -1233,10 +943,3 @@ def test_decrement_cart_item_success():
 #     assert "id" in order
 #     assert order["user_id"] == user_id
 #     assert order["total_amount"] == 200.0  # The total amount should match the cart total
-
-#     # Verify that the cart has been cleared
-#     response = client.get(f"/cart/{cart_id}")
-#     assert response.status_code == 200
-#     updated_cart = response.json()
-#     assert updated_cart["total_price"] == 0.0
-#     assert len(updated_cart["items"]) == 0